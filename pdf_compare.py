@@ -1,73 +1,185 @@
 import os
 import re
+import json
+import hashlib
+import functools
+import itertools
+import heapq
+import tempfile
 from pathlib import Path
 import datetime
-import PyPDF2
+from pypdf import PageObject, PdfReader
+from pypdf.generic import NameObject
 import difflib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from tqdm import tqdm  # 用于显示进度条
 
+try:
+    # RapidFuzz在C++中批量计算相似度，未安装时退回到difflib
+    import numpy as np
+    from rapidfuzz import fuzz, process
+except ImportError:
+    process = None
+
+# 标题提取是CPU密集型的纯Python代码，使用多进程并行处理
+MAX_WORKERS = min(os.cpu_count() or 1, 8)
+# 每个进程一次处理一批文件，并用少量线程重叠磁盘读取（如机械硬盘、网络文件系统）
+EXTRACT_BATCH_SIZE = 8
+EXTRACT_THREADS = 4
+
+# 已提取标题的缓存目录，以PDF内容的SHA-256为键
+CACHE_DIR = Path.home() / '.cache' / 'pdf_compare'
+# 标题提取规则变化时递增，使旧的缓存失效
+CACHE_VERSION = 4
+# 页面树中父节点可以提供给子页面的属性
+INHERITABLE_PAGE_ATTRIBUTES = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+# 分块比较：只比较至少共享一个4字符片段（shingle）的标题
+SHINGLE_SIZE = 4
+# 分块会漏掉少量相似对；阈值低于0.7时漏掉的比例明显上升，因此不分块，比较所有标题对
+BLOCKING_MIN_THRESHOLD = 0.7
+# 出现在超过5%（且超过100个）标题中的片段不作为分块依据
+BLOCKING_MAX_BLOCK_FRACTION = 0.05
+BLOCKING_MAX_BLOCK_SIZE = 100
+# 候选对超过全部组合的一半时，直接计算完整的相似度矩阵
+BLOCKING_MAX_PAIR_FRACTION = 0.5
+# 计算完整矩阵时每段最多的单元格数（float32，约64MB）
+CDIST_MAX_CELLS = 16 * 1024 * 1024
+
+# 标题提取和标准化用到的正则表达式，在模块加载时预先编译
+_SKIP_LINE_RE = re.compile(r'^\d+$|^Vol\.|^Abstract|^Pages|^\d{4}$|^Journal of', re.IGNORECASE)
+_SKIP_PREFIX_RE = re.compile(r'^(Received|Submitted|Accepted|Published|Copyright|DOI)', re.IGNORECASE)
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+_WS_RE = re.compile(r'\s+')
+
+def compute_file_hash(path):
+    """分块读取文件并计算其SHA-256哈希值"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(65536), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
 def extract_title_from_pdf(pdf_path):
-    """从PDF文件中提取可能的标题"""
+    """从PDF文件中提取可能的标题，内容未变化的文件直接使用缓存结果"""
     try:
-        # 打开PDF文件
-        with open(pdf_path, 'rb') as file:
-            # 创建PDF读取器对象
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            # 检查PDF是否有页面
-            if len(pdf_reader.pages) == 0:
-                return None
-            
-            # 从第一页提取文本
-            first_page_text = pdf_reader.pages[0].extract_text()
-            
-            # 如果第一页没有文本，尝试读取第二页
-            if not first_page_text and len(pdf_reader.pages) > 1:
-                first_page_text = pdf_reader.pages[1].extract_text()
-            
-            if not first_page_text:
-                return None
-            
-            # 尝试从文本中识别标题
-            # 方法1：查找换行符之前的前几行文本（通常标题在顶部）
-            lines = first_page_text.split('\n')
-            # 过滤掉空行
-            lines = [line.strip() for line in lines if line.strip()]
-            
-            # 跳过可能的期刊标题、日期等，通常论文标题在前几行
-            potential_title_lines = []
-            for i, line in enumerate(lines[:10]):  # 只考虑前10行
-                # 跳过明显不是标题的行（如日期、页码、"Abstract"等）
-                if re.search(r'^\d+$|^Vol\.|^Abstract|^Pages|^\d{4}$|^Journal of', line, re.IGNORECASE):
-                    continue
-                
-                # 如果行太短，可能是作者名或其他信息
-                if len(line) < 10:
-                    continue
-                
-                # 如果行以常见非标题开头的词开始，跳过
-                if re.match(r'^(Received|Submitted|Accepted|Published|Copyright|DOI)', line, re.IGNORECASE):
-                    continue
-                
-                potential_title_lines.append(line)
-                
-                # 论文标题通常不会很长，所以如果已经收集了1-3行，可能已经包含完整标题
-                if i >= 2 and len(potential_title_lines) > 0:
-                    break
-            
-            # 合并可能的标题行
-            potential_title = ' '.join(potential_title_lines[:3])  # 最多使用前3行
-            
-            # 如果找不到可能的标题，返回前100个字符作为备选
-            if not potential_title and len(first_page_text) > 100:
-                return first_page_text[:100]
-            
-            return potential_title
+        cache_file = CACHE_DIR / f"{compute_file_hash(pdf_path)}.json"
+        if cache_file.is_file():
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get('version') == CACHE_VERSION:
+                    return cached['title']
+            except (OSError, ValueError, KeyError):
+                pass  # 缓存损坏时重新提取
+        
+        title = parse_title_from_pdf(pdf_path)
+        
+        # 缓存写入失败不影响结果；先写临时文件再替换，避免其他进程读到不完整的文件。
+        # 内容相同的PDF可能在不同进程或同一进程的不同线程中同时写入，
+        # 因此用mkstemp为每次写入创建唯一的临时文件
+        tmp_file = None
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            fd, tmp_file = tempfile.mkstemp(dir=CACHE_DIR, prefix=f"{cache_file.name}.", suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'title': title, 'source_path': str(pdf_path)}, f, ensure_ascii=False)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            if tmp_file is not None:
+                try:
+                    os.remove(tmp_file)
+                except OSError:
+                    pass
+        
+        return title
     
     except Exception as e:
         print(f"提取标题出错 {pdf_path}: {e}")
         return None
 
+def iter_pages(reader):
+    """沿页面树按顺序逐页返回页面对象，只读取实际用到的页面
+    
+    reader.pages在首次访问时会展开整个页面树，对几百页的文档开销很大；
+    这里只展开到需要的页面，并像pypdf一样把可继承的属性传给子页面。
+    """
+    stack = [(reader.root_object['/Pages'], {})]
+    visited = set()
+    while stack:
+        node_ref, inherited = stack.pop()
+        # 损坏的文件中页面树可能有环，已访问过的节点直接跳过
+        idnum = getattr(node_ref, 'idnum', None)
+        if idnum is not None:
+            if idnum in visited:
+                continue
+            visited.add(idnum)
+        node = node_ref.get_object()
+        if '/Kids' not in node:
+            page = PageObject(reader, node.indirect_reference)
+            page.update(node)
+            for key, value in inherited.items():
+                if key not in page:
+                    page[NameObject(key)] = value
+            yield page
+            continue
+        inherited = dict(inherited)
+        for key in INHERITABLE_PAGE_ATTRIBUTES:
+            if key in node:
+                inherited[key] = node[key]
+        for kid in reversed(node['/Kids']):
+            stack.append((kid, inherited))
+
+def parse_title_from_pdf(pdf_path):
+    """解析PDF文件并从中提取可能的标题"""
+    # strict=False容忍常见的格式错误；只解析前两页的内容流，不必读取整个文档
+    reader = PdfReader(pdf_path, strict=False)
+    first_page_text = ""
+    # 如果第一页没有文本，尝试读取第二页
+    for page in itertools.islice(iter_pages(reader), 2):
+        first_page_text = page.extract_text()
+        if first_page_text.strip():
+            break
+    
+    if not first_page_text.strip():
+        return None
+    
+    # 尝试从文本中识别标题
+    # 方法1：查找换行符之前的前几行文本（通常标题在顶部）
+    # 过滤掉空行，每行只调用一次strip()
+    lines = [line for line in (raw_line.strip() for raw_line in first_page_text.splitlines()) if line]
+    
+    # 跳过可能的期刊标题、日期等，通常论文标题在前几行
+    potential_title_lines = []
+    for i, line in enumerate(lines[:10]):  # 只考虑前10行
+        # 跳过明显不是标题的行（如日期、页码、"Abstract"等）
+        if _SKIP_LINE_RE.search(line):
+            continue
+        
+        # 如果行太短，可能是作者名或其他信息
+        if len(line) < 10:
+            continue
+        
+        # 如果行以常见非标题开头的词开始，跳过
+        if _SKIP_PREFIX_RE.match(line):
+            continue
+        
+        potential_title_lines.append(line)
+        
+        # 论文标题通常不会很长，所以如果已经收集了1-3行，可能已经包含完整标题
+        if i >= 2 and len(potential_title_lines) > 0:
+            break
+    
+    # 合并可能的标题行
+    potential_title = ' '.join(potential_title_lines[:3])  # 最多使用前3行
+    
+    # 如果找不到可能的标题，返回前100个字符作为备选
+    if not potential_title and len(first_page_text) > 100:
+        return first_page_text[:100]
+    
+    return potential_title
+
+@functools.lru_cache(maxsize=4096)
 def normalize_title(title):
     """标准化标题以改善匹配"""
     if not title:
@@ -75,11 +187,243 @@ def normalize_title(title):
     # 转换为小写
     title = title.lower()
     # 移除特殊字符和多余空格
-    title = re.sub(r'[^\w\s]', ' ', title)
-    title = re.sub(r'\s+', ' ', title)
+    title = _NON_WORD_RE.sub(' ', title)
+    title = _WS_RE.sub(' ', title)
     return title.strip()
 
-def find_similar_titles(folder_a, folder_b, similarity_threshold=0.8, recursive=True):
+def walk_pdfs(folder, recursive=True):
+    """用os.scandir遍历文件夹，边遍历边返回PDF文件路径"""
+    stack = [folder]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            print(f"无法读取文件夹 {directory}: {e}")
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    stack.append(entry.path)
+            elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                yield entry.path
+
+def extract_title_batch(pdf_paths):
+    """在工作进程内用线程池提取一批PDF的标题，使磁盘读取与解析相互重叠"""
+    with ThreadPoolExecutor(max_workers=EXTRACT_THREADS) as executor:
+        return list(zip(pdf_paths, executor.map(extract_title_from_pdf, pdf_paths)))
+
+def batched(iterable, size):
+    """将可迭代对象按固定大小分批，不需要预先知道总数"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def extract_titles(pdf_paths, desc):
+    """在进程池中并行提取标题，按原顺序逐个返回(文件路径, 标题)
+    
+    pdf_paths可以是生成器，遍历文件夹的同时即可开始提取。
+    只在进程间传递路径字符串和标题，避免序列化PDF对象。
+    """
+    with tqdm(desc=desc) as progress:
+        if MAX_WORKERS <= 1:
+            # 单核机器上多进程和多线程都只会增加开销，直接顺序处理
+            for pdf_path in pdf_paths:
+                yield pdf_path, extract_title_from_pdf(pdf_path)
+                progress.update()
+            return
+        
+        with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for results in executor.map(extract_title_batch, batched(pdf_paths, EXTRACT_BATCH_SIZE)):
+                yield from results
+                progress.update(len(results))
+
+def title_shingles(normalized_title):
+    """返回标题去掉空格后所有长度为4的字符片段，用于分块索引
+    
+    去掉空格后，提取时丢失或多出的空格（如"deeplearning"）不影响分块。
+    """
+    compact = normalized_title.replace(' ', '')
+    return {compact[k:k + SHINGLE_SIZE] for k in range(len(compact) - SHINGLE_SIZE + 1)}
+
+def indexed_blocks(block_sizes, len_a):
+    """分块规则，block_titles和block_pairs共用，保证两者产生相同的候选对
+    
+    按片段把A中标题分块，返回哪些块参与分块：块为空（A中没有该片段）或超过上限
+    （如"tion"、"netw"这类过于常见的片段，形成的块几乎等于比较所有组合）的不参与。
+    block_sizes可以是整数，也可以是numpy数组（逐个元素判断）。
+    
+    两个函数都遵循同样的其余规则：没有任何参与分块的片段的标题与另一侧的所有标题比较；
+    候选对按B中索引、再按A中索引排序。
+    """
+    max_block_size = max(BLOCKING_MAX_BLOCK_SIZE, int(len_a * BLOCKING_MAX_BLOCK_FRACTION))
+    return (block_sizes > 0) & (block_sizes <= max_block_size)
+
+def block_titles(titles_a, titles_b):
+    """对B中每个标题，返回(B中索引, 需要比较的A中索引列表)
+    
+    相似的标题几乎总会共享一些字符片段，因此只比较共享片段的标题对，
+    避免比较所有N×M个组合。分块规则见indexed_blocks。
+    不检查相似度阈值：阈值较低、不需要分块时，调用方应直接比较所有标题对。
+    """
+    all_a = range(len(titles_a))
+    
+    # 建立文件夹A的倒排索引：片段 -> 包含该片段的标题索引
+    shingles_a = [title_shingles(normalized_title_a) for normalized_title_a in titles_a]
+    index_a = {}
+    for i, shingles in enumerate(shingles_a):
+        for shingle in shingles:
+            index_a.setdefault(shingle, []).append(i)
+    
+    index_a = {shingle: block for shingle, block in index_a.items()
+               if indexed_blocks(len(block), len(titles_a))}
+    unindexed_a = [i for i, shingles in enumerate(shingles_a) if shingles.isdisjoint(index_a)]
+    
+    for j, normalized_title_b in enumerate(titles_b):
+        shingles = [shingle for shingle in title_shingles(normalized_title_b) if shingle in index_a]
+        if not shingles:
+            yield j, all_a
+            continue
+        candidates = set(unindexed_a)
+        for shingle in shingles:
+            candidates.update(index_a[shingle])
+        yield j, sorted(candidates)
+
+def encode_shingles(titles):
+    """把每个标题的片段编码为整数（字符串哈希值），返回(片段编码数组, 所属标题索引数组)"""
+    shingle_ids, owners = [], []
+    for k, normalized_title in enumerate(titles):
+        shingles = title_shingles(normalized_title)
+        shingle_ids.extend(map(hash, shingles))
+        owners.extend([k] * len(shingles))
+    return np.array(shingle_ids, dtype=np.int64), np.array(owners, dtype=np.int64)
+
+def block_pairs(titles_a, titles_b):
+    """与block_titles相同（分块规则见indexed_blocks），但用numpy向量化计算，返回(A中索引数组, B中索引数组)
+    
+    片段先编码为整数，倒排索引的连接和候选对去重都在numpy中完成，
+    避免在Python中逐个合并集合。候选对按B中索引、再按A中索引排序。
+    哈希冲突只会多产生几个候选对，不影响最终得分。
+    不检查相似度阈值：阈值较低、不需要分块时，调用方应直接计算完整的相似度矩阵。
+    """
+    len_a, len_b = len(titles_a), len(titles_b)
+    
+    # 按片段编码排序后，每个片段在A中对应一段连续区间，区间长度即块的大小
+    ids_a, owners_a = encode_shingles(titles_a)
+    ids_b, owners_b = encode_shingles(titles_b)
+    order = np.argsort(ids_a, kind='stable')
+    sorted_ids, sorted_owners = ids_a[order], owners_a[order]
+    starts = np.searchsorted(sorted_ids, ids_b, side='left')
+    counts = np.searchsorted(sorted_ids, ids_b, side='right') - starts
+    
+    # 只保留参与分块的片段
+    keep_b = indexed_blocks(counts, len_a)
+    starts, counts, owners_b = starts[keep_b], counts[keep_b], owners_b[keep_b]
+    block_sizes_a = (np.searchsorted(sorted_ids, sorted_ids, side='right')
+                     - np.searchsorted(sorted_ids, sorted_ids, side='left'))
+    indexed_owners_a = sorted_owners[indexed_blocks(block_sizes_a, len_a)]
+    
+    # B的每个片段与A中对应区间内的所有标题组成候选对，编码为B中索引×len_a+A中索引
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+    keys = [np.repeat(owners_b, counts) * len_a + sorted_owners[offsets]]
+    
+    # 没有可索引片段的标题与所有标题比较
+    unindexed_a = np.setdiff1d(np.arange(len_a), indexed_owners_a)
+    unindexed_b = np.setdiff1d(np.arange(len_b), owners_b)
+    keys.append(np.add.outer(np.arange(len_b) * len_a, unindexed_a).ravel())
+    keys.append(np.add.outer(unindexed_b * len_a, np.arange(len_a)).ravel())
+    
+    # 排序后去掉重复的候选对（共享多个片段的标题对会出现多次）
+    keys = np.sort(np.concatenate(keys))
+    keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    cols, rows = np.divmod(keys, len_a)
+    return rows, cols
+
+def score_all_pairs(titles_a, titles_b, score_cutoff):
+    """用rapidfuzz.process.cdist计算所有标题对的相似度，逐个返回达到阈值的(A中索引, B中索引, 相似度)
+    
+    按B分段计算矩阵以限制内存占用；结果按B中索引、再按A中索引排序，与分块时的顺序一致。
+    """
+    step = max(1, CDIST_MAX_CELLS // len(titles_a))
+    for start in range(0, len(titles_b), step):
+        # fuzz.ratio是对称的，以B为行使np.nonzero的结果按B中索引排序
+        scores = process.cdist(titles_b[start:start + step], titles_a, scorer=fuzz.ratio,
+                               score_cutoff=score_cutoff, dtype=np.float32, workers=-1)
+        if score_cutoff > 0:
+            cols, rows = np.nonzero(scores)
+        else:
+            cols, rows = np.indices(scores.shape).reshape(2, -1)
+        for j, i in zip(cols.tolist(), rows.tolist()):
+            yield i, start + j, float(scores[j, i]) / 100
+
+def compare_titles(titles_a, titles_b, similarity_threshold):
+    """比较两组标准化标题，逐个返回相似度达到阈值的(A中索引, B中索引, 相似度)
+    
+    结果以生成器形式产出，调用方不必在内存中保存所有相似对。
+    """
+    if not titles_a or not titles_b:
+        return
+    
+    if process is not None:
+        score_cutoff = similarity_threshold * 100
+        # 旧版RapidFuzz没有cpdist，此时不分块，直接计算完整的相似度矩阵
+        if similarity_threshold < BLOCKING_MIN_THRESHOLD or not hasattr(process, 'cpdist'):
+            yield from score_all_pairs(titles_a, titles_b, score_cutoff)
+            return
+        
+        rows, cols = block_pairs(titles_a, titles_b)
+        if len(rows) > len(titles_a) * len(titles_b) * BLOCKING_MAX_PAIR_FRACTION:
+            # 候选对接近全部组合时，分块已无意义，逐对传入字符串反而更慢、更占内存
+            yield from score_all_pairs(titles_a, titles_b, score_cutoff)
+            return
+        rows, cols = rows.tolist(), cols.tolist()
+        if not rows:
+            return
+        
+        # 在C++中并行计算所有候选标题对的相似度，低于阈值的得分会被置为0
+        scores = process.cpdist([titles_a[i] for i in rows], [titles_b[j] for j in cols],
+                                scorer=fuzz.ratio, score_cutoff=score_cutoff,
+                                dtype=np.float32, workers=-1)
+        if score_cutoff > 0:
+            matched = np.nonzero(scores)[0].tolist()
+        else:
+            matched = range(len(rows))
+        for k in matched:
+            yield rows[k], cols[k], float(scores[k]) / 100
+        return
+    
+    if similarity_threshold < BLOCKING_MIN_THRESHOLD:
+        # 阈值较低时不分块，比较所有标题对
+        blocks = ((j, range(len(titles_a))) for j in range(len(titles_b)))
+    else:
+        blocks = block_titles(titles_a, titles_b)
+    
+    # 标题较短，autojunk只会扭曲得分；set_seq2会缓存B标题的索引，在所有候选标题间复用
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    for j, candidates in blocks:
+        normalized_title_b = titles_b[j]
+        matcher.set_seq2(normalized_title_b)
+        for i in candidates:
+            normalized_title_a = titles_a[i]
+            if normalized_title_a == normalized_title_b:
+                similarity = 1.0
+            else:
+                matcher.set_seq1(normalized_title_a)
+                # 先用两个廉价的上界过滤：real_quick_ratio只看长度，quick_ratio只看字符计数，
+                # 上界已低于阈值时，完整的序列匹配不可能达到阈值
+                if matcher.real_quick_ratio() < similarity_threshold:
+                    continue
+                if matcher.quick_ratio() < similarity_threshold:
+                    continue
+                # 使用序列匹配计算相似度
+                similarity = matcher.ratio()
+            if similarity >= similarity_threshold:
+                yield i, j, similarity
+
+def find_similar_titles(folder_a, folder_b, similarity_threshold=0.8, recursive=True, top_k=None):
     """在两个文件夹中查找标题相似的PDF论文
     
     参数:
@@ -87,6 +431,7 @@ def find_similar_titles(folder_a, folder_b, similarity_threshold=0.8, recursive=
         folder_b: 第二个文件夹路径
         similarity_threshold: 相似度阈值（0到1之间）
         recursive: 是否递归搜索子文件夹
+        top_k: 只保留相似度最高的前top_k对，None表示保留全部
     
     返回:
         包含相似论文信息的列表
@@ -94,66 +439,71 @@ def find_similar_titles(folder_a, folder_b, similarity_threshold=0.8, recursive=
     # 存储文件夹A中文件的标题
     folder_a_titles = {}
     
-    # 获取所有PDF文件的函数
-    def get_pdf_files(folder):
-        if recursive:
-            return list(Path(folder).glob('**/*.pdf'))
-        else:
-            return list(Path(folder).glob('*.pdf'))
-    
     # 处理文件夹A中的文件
     print(f"正在从文件夹A中提取论文标题: {folder_a}")
-    files_a = get_pdf_files(folder_a)
+    for file_path, title in extract_titles(walk_pdfs(folder_a, recursive), desc="处理文件夹A"):
+        try:
+            if title:
+                normalized_title = normalize_title(title)
+                relative_path = os.path.relpath(file_path, folder_a)
+                folder_a_titles[relative_path] = {
+                    'original': title,
+                    'normalized': normalized_title
+                }
+        except Exception as e:
+            print(f"处理文件出错 {file_path}: {e}")
     
-    for file_path in tqdm(files_a, desc="处理文件夹A"):
-        if file_path.is_file() and file_path.suffix.lower() == '.pdf':
-            try:
-                title = extract_title_from_pdf(file_path)
-                if title:
-                    normalized_title = normalize_title(title)
-                    relative_path = file_path.relative_to(folder_a)
-                    folder_a_titles[str(relative_path)] = {
-                        'original': title,
-                        'normalized': normalized_title
-                    }
-            except Exception as e:
-                print(f"处理文件出错 {file_path}: {e}")
+    # 处理文件夹B中的文件
+    folder_b_titles = {}
+    print(f"\n正在从文件夹B中提取论文标题: {folder_b}")
+    for file_path, title in extract_titles(walk_pdfs(folder_b, recursive), desc="处理文件夹B"):
+        try:
+            if title:
+                normalized_title = normalize_title(title)
+                relative_path = os.path.relpath(file_path, folder_b)
+                folder_b_titles[relative_path] = {
+                    'original': title,
+                    'normalized': normalized_title
+                }
+        except Exception as e:
+            print(f"处理文件出错 {file_path}: {e}")
+    
+    # 比较两个文件夹中所有标题的相似度
+    print("\n正在比较标题相似度...")
+    paths_a = list(folder_a_titles)
+    paths_b = list(folder_b_titles)
+    norm_a = [folder_a_titles[path]['normalized'] for path in paths_a]
+    norm_b = [folder_b_titles[path]['normalized'] for path in paths_b]
+    
+    matches = compare_titles(norm_a, norm_b, similarity_threshold)
+    
+    if top_k is not None:
+        # compare_titles逐个产出结果，用大小为top_k的最小堆只保留得分最高的结果，
+        # 不必保存所有相似对，也避免对它们全部排序；
+        # 序号取负数，使相似度相同时与完整排序一样保留先出现的结果
+        heap = []
+        for seq, (i, j, similarity) in enumerate(matches):
+            item = (similarity, -seq, i, j)
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            else:
+                heapq.heappushpop(heap, item)
+        matches = [(i, j, similarity) for similarity, _, i, j in sorted(heap, reverse=True)]
     
     # 存储相似文件的列表
     similar_papers = []
+    for i, j, similarity in matches:
+        similar_papers.append({
+            'path_a': paths_a[i],
+            'path_b': paths_b[j],
+            'title_a': folder_a_titles[paths_a[i]]['original'],
+            'title_b': folder_b_titles[paths_b[j]]['original'],
+            'similarity': similarity
+        })
     
-    # 处理文件夹B中的文件并检查相似性
-    print(f"\n正在从文件夹B中提取论文标题并比较: {folder_b}")
-    files_b = get_pdf_files(folder_b)
-    
-    for file_path in tqdm(files_b, desc="处理文件夹B"):
-        if file_path.is_file() and file_path.suffix.lower() == '.pdf':
-            try:
-                title_b = extract_title_from_pdf(file_path)
-                if title_b:
-                    normalized_title_b = normalize_title(title_b)
-                    relative_path_b = str(file_path.relative_to(folder_b))
-                    
-                    # 比较与文件夹A中所有标题的相似度
-                    for path_a, title_info_a in folder_a_titles.items():
-                        normalized_title_a = title_info_a['normalized']
-                        
-                        # 使用序列匹配计算相似度
-                        similarity = difflib.SequenceMatcher(None, normalized_title_a, normalized_title_b).ratio()
-                        
-                        if similarity >= similarity_threshold:
-                            similar_papers.append({
-                                'path_a': path_a,
-                                'path_b': relative_path_b,
-                                'title_a': title_info_a['original'],
-                                'title_b': title_b,
-                                'similarity': similarity
-                            })
-            except Exception as e:
-                print(f"处理文件出错 {file_path}: {e}")
-    
-    # 按相似度排序结果
-    similar_papers.sort(key=lambda x: x['similarity'], reverse=True)
+    if top_k is None:
+        # 按相似度排序结果
+        similar_papers.sort(key=lambda x: x['similarity'], reverse=True)
     
     return similar_papers
 
@@ -168,13 +518,16 @@ def save_results_to_file(similar_papers, folder_a, folder_b, output_file):
         
         if similar_papers:
             f.write(f"找到{len(similar_papers)}对标题相似的论文:\n\n")
+            # 先在内存中拼接所有结果，再一次性写入，避免每行一次write调用
+            parts = []
             for i, paper in enumerate(similar_papers, 1):
-                f.write(f"相似对 #{i} (相似度: {paper['similarity']:.2f}):\n")
-                f.write(f"文件夹A: {paper['path_a']}\n")
-                f.write(f"标题A: {paper['title_a']}\n")
-                f.write(f"文件夹B: {paper['path_b']}\n")
-                f.write(f"标题B: {paper['title_b']}\n")
-                f.write("-" * 50 + "\n\n")
+                parts.append(f"相似对 #{i} (相似度: {paper['similarity']:.2f}):\n"
+                             f"文件夹A: {paper['path_a']}\n"
+                             f"标题A: {paper['title_a']}\n"
+                             f"文件夹B: {paper['path_b']}\n"
+                             f"标题B: {paper['title_b']}\n"
+                             + "-" * 50 + "\n\n")
+            f.write("".join(parts))
         else:
             f.write("未找到标题相似的论文。\n")
     